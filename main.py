@@ -1,148 +1,354 @@
+import os
 import pickle
-from collections import UserDict
-import re                                   # Для валідації номерів телефонів
-from datetime import datetime, timedelta
+from array import array
+from bisect import bisect_left, bisect_right
+from calendar import isleap
+from datetime import date, timedelta
+from operator import itemgetter
+
+## Поля запису зберігаються як звичайні значення (str, int), класи-обгортки не потрібні;
+## функції нижче лише перевіряють значення перед збереженням
+
+# Перевірка імені контакту (обов'язкове поле)
+def validate_name(name):
+    if not name:
+        raise ValueError("Name cannot be empty")  # Перевірка на порожнє ім'я
+    return name
+
+# Валідація формату телефону (10 цифр ASCII); isascii відсікає "²", "٣" тощо,
+# які isdigit теж вважає цифрами
+def is_valid_phone(phone):
+    return isinstance(phone, str) and len(phone) == 10 and phone.isascii() and phone.isdigit()
+
+# Перевірка номеру телефону перед збереженням у контакті
+def validate_phone(phone):
+    if not is_valid_phone(phone):
+        raise ValueError("Invalid phone number. Must be 10 digits.")
+    return phone
+
+# Розбір дня народження у форматі DD.MM.YYYY (вручну, без strptime);
+# дата зберігається як порядковий номер дня (date.toordinal)
+def parse_birthday(value):
+    if len(value) != 10 or value[2] != "." or value[5] != ".":
+        raise ValueError("Invalid date format. Use DD.MM.YYYY")
+    day, month, year = value[0:2], value[3:5], value[6:10]
+    digits = day + month + year
+    # int() пропускає "+", "_", пробіли та не-ASCII цифри (наприклад, "٠١"), strptime — ні
+    if not (digits.isascii() and digits.isdigit()):
+        raise ValueError("Invalid date format. Use DD.MM.YYYY")
+    try:
+        return date(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        raise ValueError("Invalid date format. Use DD.MM.YYYY")
 
-## Базовий клас для всіх полів запису
-class Field:
-    def __init__(self, value):
-        self.value = value
-
-    def __str__(self):
-        return str(self.value)
-
-## Клас для зберігання імені контакту (обов'язкове поле)
-class Name(Field):
-    def __init__(self, value):
-        if not value:
-            raise ValueError("Name cannot be empty")  # Перевірка на порожнє ім'я
-        super().__init__(value)
-
-## Клас для зберігання номеру телефону з валідацією (10 цифр)
-class Phone(Field):
-    def __init__(self, value):
-        if not self.is_valid(value):
-            raise ValueError("Invalid phone number. Must be 10 digits.")
-        super().__init__(value)
-
-    # Валідація формату телефону (10 цифр)
-    @staticmethod
-    def is_valid(phone):
-        return bool(re.match(r"^\d{10}$", phone))
-
-## Клас для зберігання дня народження
-class Birthday(Field):
-    def __init__(self, value):
-        try:
-            # Перевірка формату дати: DD.MM.YYYY
-            self.value = datetime.strptime(value, "%d.%m.%Y")
-        except ValueError:
-            raise ValueError("Invalid date format. Use DD.MM.YYYY")
-    
-    def __str__(self):
-        return self.value.strftime("%d.%m.%Y")
+# Форматування дня народження для виводу (об'єкт date створюється лише тут)
+def format_birthday(birthday):
+    birthday = date.fromordinal(birthday)
+    return f"{birthday.day:02}.{birthday.month:02}.{birthday.year:04}"
 
 ## Клас для зберігання інформації про контакт (ім'я + телефони)
 class Record:
+    # Значення за замовчуванням для кешів і посилання на книгу: вони не зберігаються
+    # у файл, тож після завантаження запис бере їх звідси без окремого __setstate__
+    _phones_str = None
+    _formatted = None
+    _book = None
+
     def __init__(self, name):
-        self.name = Name(name)
-        self.phones = []
+        self.name = validate_name(name)
+        self.phones = {}  # Номери телефонів (ключі словника): пошук і видалення за O(1)
         self.birthday = None  # Поле день народження може бути порожнім
+        self._phones_str = None  # Кеш рядка з телефонами, скидається при зміні телефонів
+        self._formatted = None  # Кеш повного опису контакту, скидається при будь-якій зміні
+        self._book = None  # Книга, до якої запис додано через add_record (для індексу днів народження)
+
+    # Скидання кешів після зміни телефонів
+    def _phones_changed(self):
+        self._phones_str = None
+        self._formatted = None
 
     # Додавання телефону до контакту
     def add_phone(self, phone):
-        self.phones.append(Phone(phone))  # Додаємо телефон у вигляді об'єкта Phone
+        self.phones[validate_phone(phone)] = None
+        self._phones_changed()
 
     # Видалення телефону з контакту
     def remove_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                self.phones.remove(p)
-                break
+        if phone in self.phones:
+            del self.phones[phone]
+            self._phones_changed()
 
     # Редагування телефону в контакті
     def edit_phone(self, old_phone, new_phone):
-        for p in self.phones:
-            if p.value == old_phone:
-                p.value = new_phone
-                break
+        if old_phone in self.phones:
+            validate_phone(new_phone)  # Новий номер теж проходить валідацію
+            # Словник будується заново, щоб новий номер став на місце старого
+            self.phones = {new_phone if p == old_phone else p: None for p in self.phones}
+            self._phones_changed()
 
     # Пошук телефону в контакті
     def find_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                return p.value
-        return None
+        return phone if phone in self.phones else None
 
-    # Додавання дня народження
+    # Додавання дня народження (книга, що містить запис, оновлює свій індекс)
     def add_birthday(self, birthday):
-        self.birthday = Birthday(birthday)
-
+        old_birthday = self.birthday
+        self.birthday = parse_birthday(birthday)
+        self._formatted = None
+        if self._book is not None:
+            self._book._birthday_changed(self, old_birthday)
+
+    # Телефони контакту одним рядком (обчислюється лише після змін)
+    def phones_str(self):
+        if self._phones_str is None:
+            self._phones_str = "; ".join(self.phones)
+        return self._phones_str
+
+    # Опис контакту будується лише після змін, далі повертається з кешу
     def __str__(self):
-        return f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}, birthday: {self.birthday if self.birthday else 'Not set'}"
+        if self._formatted is None:
+            self._formatted = f"Contact name: {self.name}, phones: {self.phones_str()}, birthday: {format_birthday(self.birthday) if self.birthday else 'Not set'}"
+        return self._formatted
+
+    # Кеші та посилання на книгу не зберігаються у файл: після завантаження
+    # кеші будуються заново, а посилання відновлює книга
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_phones_str", None)
+        state.pop("_formatted", None)
+        state.pop("_book", None)
+        return state
+
+# Ключ дня в межах року у вигляді MMDD (15 березня -> 315)
+def date_key(day):
+    return day.month * 100 + day.day
+
+# Ключ MMDD дня народження, збереженого як порядковий номер дня
+def birthday_key(birthday):
+    return date_key(date.fromordinal(birthday))
+
+# Версія формату файлу адресної книги; файли без неї (попередні версії
+# програми) завантажуються через перетворення в load_data
+BOOK_FORMAT = 2
 
 ## Клас для зберігання та управління адресною книгою (словник)
-class AddressBook(UserDict):
+## Індекс днів народження оновлюють лише add_record, delete та Record.add_birthday;
+## зміни словника напряму (book[name] = ..., del book[name], update) його обходять
+class AddressBook(dict):
+    def __init__(self):
+        super().__init__()
+        self._init_birthday_index()
+
+    # Відсортований індекс днів народження у двох паралельних послідовностях:
+    # компактний масив ключів MMDD (2 байти на ключ) та самі записи
+    def _init_birthday_index(self):
+        self._birthday_keys = array("H")
+        self._birthday_records = []
+
+    # Додавання запису в індекс днів народження зі збереженням порядку
+    def _index_birthday(self, record):
+        key = birthday_key(record.birthday)
+        i = bisect_right(self._birthday_keys, key)
+        self._birthday_keys.insert(i, key)
+        self._birthday_records.insert(i, record)
+
+    # Видалення запису з індексу днів народження; шукаємо лише серед записів
+    # з тим самим ключем, а якщо запису там немає, індекс будується заново
+    def _unindex_birthday(self, record, birthday):
+        key = birthday_key(birthday)
+        keys, records = self._birthday_keys, self._birthday_records
+        for i in range(bisect_left(keys, key), bisect_right(keys, key)):
+            if records[i] is record:
+                del keys[i]
+                del records[i]
+                return
+        self._rebuild_birthday_index()
+
+    # Повна перебудова індексу днів народження з записів книги, O(n log n)
+    def _rebuild_birthday_index(self):
+        entries = [
+            (birthday_key(record.birthday), record)
+            for record in self.values()
+            if record.birthday is not None
+        ]
+        entries.sort(key=itemgetter(0))
+        self._birthday_keys = array("H", [key for key, record in entries])
+        self._birthday_records = [record for key, record in entries]
+
+    # Виклик з Record.add_birthday: переносимо запис у індексі на нову дату
+    def _birthday_changed(self, record, old_birthday):
+        if old_birthday is not None:
+            self._unindex_birthday(record, old_birthday)
+        self._index_birthday(record)
+
+    # Індекс не зберігається у файл: записи додаються до словника без індексації
+    # (SETITEMS), а потім __setstate__ один раз будує індекс
+    def __reduce__(self):
+        return self.__class__, (), {"format": BOOK_FORMAT}, None, iter(self.items())
+
+    # Зі збереженого стану береться лише версія формату; завантаження — єдине
+    # місце, де індекс і посилання записів на книгу відновлюються з нуля
+    def __setstate__(self, state):
+        if not isinstance(state, dict) or state.get("format") != BOOK_FORMAT:
+            # Стан попередньої версії (атрибути data, _birthdays тощо) не підходить
+            raise pickle.UnpicklingError("Address book was saved by an older version")
+        for record in self.values():
+            record._book = self
+        self._rebuild_birthday_index()
+
     # Додавання запису в книгу контактів
     def add_record(self, record):
-        self.data[record.name.value] = record
+        name = record.name
+        self.delete(name)  # Запис з тим самим ім'ям замінюється разом з індексом
+        if record._book is self and record.birthday is not None:
+            self._unindex_birthday(record, record.birthday)  # Запис, видалений в обхід delete
+        self[name] = record
+        record._book = self
+        if record.birthday is not None:
+            self._index_birthday(record)
 
     # Пошук запису за іменем
     def find(self, name):
-        return self.data.get(name)
+        return self.get(name)
 
     # Видалення запису з книги за іменем
     def delete(self, name):
-        if name in self.data:
-            del self.data[name]
+        record = self.pop(name, None)
+        if record is not None and record._book is self:
+            record._book = None
+            if record.birthday is not None:
+                self._unindex_birthday(record, record.birthday)
 
     # Отримання списку контактів, чий день народження наступного тижня
     def get_upcoming_birthdays(self):
-        today = datetime.today()
-        upcoming = []
-        
-        for record in self.data.values():
-            if record.birthday:
-                birthday = record.birthday.value
-                # Перевірка, чи вже минув день народження цього року
-                birthday_this_year = birthday.replace(year=today.year)
-
-                # Якщо день народження вже минув в цьому році, розглядаємо наступний рік
-                if birthday_this_year < today:
-                    birthday_this_year = birthday_this_year.replace(year=today.year + 1)
-                
-                # Перевірка, чи день народження в межах наступного тижня
-                if today <= birthday_this_year <= today + timedelta(days=7):
-                    upcoming.append(record)
-        
-        return upcoming
+        today = date.today()
+        end = today + timedelta(days=7)
+        start_key = date_key(today)
+        end_key = date_key(end)
+        # 29 лютого в невисокосний рік святкується 28 лютого
+        if end_key == 228 and not isleap(end.year):
+            end_key = 229
+
+        # Двійковий пошук меж тижня в масиві ключів; якщо тиждень переходить
+        # через Новий рік, беремо кінець грудня та початок січня
+        keys, records = self._birthday_keys, self._birthday_records
+        start = bisect_left(keys, start_key)
+        stop = bisect_right(keys, end_key)
+        if start_key <= end_key:
+            upcoming = records[start:stop]
+        else:
+            upcoming = records[start:] + records[:stop]
+
+        # Записи, видалені чи замінені в обхід книги, пропускаються
+        return [record for record in upcoming if self.get(record.name) is record]
+
+# Розмір буфера для читання/запису файлу адресної книги (1 МБ)
+BUFFER_SIZE = 1 << 20
+# Протокол pickle зафіксовано (5, Python 3.8+): файл читається будь-якою сучасною
+# версією Python, навіть коли HIGHEST_PROTOCOL у новіших версіях зросте
+PICKLE_PROTOCOL = 5
 
 # Функція для збереження адресної книги у файл
 def save_data(book, filename="addressbook.pkl"):
-    with open(filename, "wb") as f:
-        pickle.dump(book, f)
+    # Спершу пишемо в тимчасовий файл, потім атомарно підміняємо ним основний,
+    # тож збій під час запису не пошкодить попередньо збережену книгу
+    tmp_filename = filename + ".tmp"
+    try:
+        with open(tmp_filename, "wb", buffering=BUFFER_SIZE) as f:
+            pickle.dump(book, f, protocol=PICKLE_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        # Невдалий запис не повинен залишати тимчасовий файл на диску
+        try:
+            os.remove(tmp_filename)
+        except FileNotFoundError:
+            pass
+        raise
+
+## Завантаження файлів, збережених попередніми версіями програми
+
+# Заглушка для записів і полів старого формату (Record, Name, Phone, Birthday):
+# pickle просто заповнює її __dict__ збереженим станом
+class _LegacyObject:
+    pass
+
+# Заглушка для адресної книги старого формату (UserDict з атрибутом data або dict)
+class _LegacyBook(dict):
+    pass
+
+# Unpickler, що підставляє заглушки замість класів програми,
+# тож файл будь-якої попередньої версії читається без помилок
+class _LegacyUnpickler(pickle.Unpickler):
+    LEGACY_CLASSES = {
+        "AddressBook": _LegacyBook,
+        "Record": _LegacyObject,
+        "Field": _LegacyObject,
+        "Name": _LegacyObject,
+        "Phone": _LegacyObject,
+        "Birthday": _LegacyObject,
+    }
+
+    def find_class(self, module, name):
+        if module in ("__main__", "main", __name__) and name in self.LEGACY_CLASSES:
+            return self.LEGACY_CLASSES[name]
+        return super().find_class(module, name)
+
+# Значення поля старого формату: об'єкт Field зберігав його в атрибуті value
+def _legacy_value(value):
+    return value.__dict__.get("value") if isinstance(value, _LegacyObject) else value
+
+# Перетворення книги старого формату на AddressBook; записи додаються через
+# add_record, тож індекс днів народження будується заново
+def _migrate_book(legacy_book):
+    records = legacy_book.__dict__.get("data", legacy_book)  # UserDict зберігав записи в data
+    book = AddressBook()
+    for legacy_record in records.values():
+        state = legacy_record.__dict__
+        record = Record(_legacy_value(state["name"]))
+        for phone in state.get("phones") or ():
+            # Номери не перевіряються повторно, щоб не втратити збережені дані
+            record.phones[_legacy_value(phone)] = None
+        birthday = _legacy_value(state.get("birthday"))
+        if birthday is not None:
+            # datetime у старих версіях, порядковий номер дня (int) у нових
+            record.birthday = birthday if isinstance(birthday, int) else birthday.toordinal()
+        book.add_record(record)
+    return book
 
 # Функція для завантаження адресної книги з файлу
 def load_data(filename="addressbook.pkl"):
     try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
+        with open(filename, "rb", buffering=BUFFER_SIZE) as f:
+            book = pickle.load(f)
+        if isinstance(book, AddressBook):
+            return book
     except FileNotFoundError:
         return AddressBook()  # Якщо файл не знайдено, повертається новий об'єкт AddressBook
+    except Exception:
+        pass  # Файл попередньої версії програми: пробуємо перетворити його нижче
 
-# Декоратор для обробки помилок
-def input_error(func):
-    def wrapper(*args, **kwargs):
+    try:
+        with open(filename, "rb", buffering=BUFFER_SIZE) as f:
+            return _migrate_book(_LegacyUnpickler(f).load())
+    except Exception:
+        # Пошкоджений або невідомий файл відкладаємо вбік, щоб його не перезаписало
+        # збереження при виході, і починаємо з порожньої книги
+        # Вже наявні резервні копії не перезаписуються: беремо перше вільне ім'я
+        backup_filename = filename + ".bak"
+        number = 1
+        while os.path.exists(backup_filename):
+            backup_filename = f"{filename}.bak{number}"
+            number += 1
         try:
-            return func(*args, **kwargs)
-        except ValueError as e:
-            return str(e)
-        except IndexError:
-            return "Missing argument. Please check the command format."
-    return wrapper
-
-# Функції команд
-@input_error
+            os.replace(filename, backup_filename)
+            print(f"Could not read {filename}; it was moved to {backup_filename}.")
+        except OSError:
+            print(f"Could not read {filename}; starting with an empty address book.")
+        return AddressBook()
+
+# Функції команд (помилки введення обробляються в main)
 def add_birthday(args, book):
     name, birthday = args
     record = book.find(name)
@@ -152,25 +358,22 @@ def add_birthday(args, book):
     else:
         return f"Contact {name} not found."
 
-@input_error
 def show_birthday(args, book):
     name = args[0]
     record = book.find(name)
     if record and record.birthday:
-        return f"{name}'s birthday: {record.birthday}"
+        return f"{name}'s birthday: {format_birthday(record.birthday)}"
     elif record:
         return f"{name} does not have a birthday set."
     else:
         return f"Contact {name} not found."
 
-@input_error
 def birthdays(args, book):
     upcoming_birthdays = book.get_upcoming_birthdays()
     if upcoming_birthdays:
-        return "\n".join([f"{record.name.value}: {record.birthday}" for record in upcoming_birthdays])
+        return "\n".join([f"{record.name}: {format_birthday(record.birthday)}" for record in upcoming_birthdays])
     return "No upcoming birthdays this week."
 
-@input_error
 def add_contact(args, book):
     name, phone, *_ = args
     record = book.find(name)
@@ -183,7 +386,6 @@ def add_contact(args, book):
         record.add_phone(phone)
     return message
 
-@input_error
 def change_contact(args, book):
     name, old_phone, new_phone = args
     record = book.find(name)
@@ -192,60 +394,63 @@ def change_contact(args, book):
         return f"Phone for {name} changed from {old_phone} to {new_phone}."
     return f"Contact {name} not found."
 
-@input_error
 def show_phone(args, book):
     name = args[0]
     record = book.find(name)
     if record:
-        return f"Phones for {name}: {'; '.join(p.value for p in record.phones)}"
+        return f"Phones for {name}: {record.phones_str()}"
     return f"Contact {name} not found."
 
-@input_error
 def show_all_contacts(args, book):
-    if book.data:
-        return "\n".join([str(record) for record in book.data.values()])
+    if book:
+        return "\n".join(str(record) for record in book.values())
     return "No contacts in the address book."
 
+# Таблиця команд: назва команди -> функція-обробник
+COMMANDS = {
+    "add": add_contact,
+    "change": change_contact,
+    "phone": show_phone,
+    "all": show_all_contacts,
+    "add-birthday": add_birthday,
+    "show-birthday": show_birthday,
+    "birthdays": birthdays,
+}
+
 # Головна функція
 def main():
     book = load_data()  # Завантажуємо адресну книгу при запуску
-    print("Welcome to the assistant bot!")
+    # Локальні імена замість глобальних: у циклі вони шукаються швидше
+    read_input = input
+    show = print
+    get_handler = COMMANDS.get
+    show("Welcome to the assistant bot!")
     
     while True:
-        user_input = input("Enter a command: ")
+        user_input = read_input("Enter a command: ")
         command, *args = user_input.split()
 
-        if command in ["close", "exit"]:
+        if command in ("close", "exit"):
             save_data(book)  # Зберігаємо адресну книгу при виході
-            print("Good bye!")
+            show("Good bye!")
             break
 
         elif command == "hello":
-            print("How can I help you?")
-
-        elif command == "add":
-            print(add_contact(args, book))
-
-        elif command == "change":
-            print(change_contact(args, book))
-
-        elif command == "phone":
-            print(show_phone(args, book))
-
-        elif command == "all":
-            print(show_all_contacts(args, book))
-
-        elif command == "add-birthday":
-            print(add_birthday(args, book))
-
-        elif command == "show-birthday":
-            print(show_birthday(args, book))
-
-        elif command == "birthdays":
-            print(birthdays(args, book))
+            show("How can I help you?")
 
         else:
-            print("Invalid command.")
+            handler = get_handler(command)
+            if handler is None:
+                show("Invalid command.")
+                continue
+            # Обробка помилок введення для всіх команд в одному місці
+            try:
+                result = handler(args, book)
+            except ValueError as e:
+                result = str(e)
+            except IndexError:
+                result = "Missing argument. Please check the command format."
+            show(result)
 
 if __name__ == "__main__":
     main()